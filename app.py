@@ -6,29 +6,120 @@
 #
 # This way, your app dynamically reads the key at runtime without exposing it in code or repository.
 
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, g, render_template, stream_template, request, redirect, url_for, jsonify
+from flask.json.provider import JSONProvider
+from markupsafe import Markup, escape
 from werkzeug.exceptions import BadRequest
 from models.todo import Todo
 from datetime import datetime
+from collections import OrderedDict
+import hashlib
 import os
+import re
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 load_dotenv()  # Loads environment variables from .env file
 
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson, which encodes straight to bytes"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round-trip dumps() would cost
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', '')
 todo = Todo()
 
+# Shared HTTP session so Gemini calls reuse pooled keep-alive connections
+# instead of paying a new TCP + TLS handshake on every /chat request
+_http = requests.Session()
+_http.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=2))
+
+# LRU of Gemini replies keyed by prompt hash. Only replies that don't
+# change state are stored, so a repeated question skips the round-trip.
+# The prompt embeds the task list, so any task change misses the cache.
+_GEMINI_CACHE_SIZE = 256
+_gemini_cache = OrderedDict()
+
+GEMINI_MODEL = "gemini-1.5-flash"
+GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1/models/{GEMINI_MODEL}:generateContent"
+
+_ACTION_MARKER = "###JSON###"
+
+# Fixed part of the /chat prompt: structured response and JSON command.
+# Only the task list and the user's message are spliced in per request.
+_PROMPT_HEAD = """
+You are a To-Do List assistant.
+Always reply in **two parts**:
+1. A natural language response for the user, using:
+   - Bullet points for tasks
+   - **Bold** for task titles
+   - '✅' for completed, '⏳' for pending
+2. A JSON object on a new line starting with '###JSON###' that specifies the action.
+
+Valid actions:
+- add {"title": "...", "priority": "high/medium/low", "completed": true/false}
+- complete {"id": 1}
+- delete {"id": 1}
+- list {}
+
+User's current tasks:
+"""
+
+# HTML wrappers for chat replies; Markup.format() escapes every argument
+_ADDED_HTML = Markup(
+    "<div class='ai-success'>"
+    "<span class='ai-icon'>✅</span> "
+    "<span class='ai-task-title'>{}</span> "
+    "<span class='ai-task-priority {}'>{} priority</span> "
+    "added successfully!"
+    "</div>"
+)
+_RESPONSE_HTML = Markup("<div class='ai-response ai-todo-list'>{}</div>")
+_NEWLINE_RE = re.compile(r'\n')
+
+def _today():
+    """Today's date as YYYY-MM-DD, computed at most once per request"""
+    if 'today' not in g:
+        g.today = datetime.now().strftime('%Y-%m-%d')
+    return g.today
+
+class _LazyToday:
+    """Renders as today's date, but only looks it up if a template uses it"""
+
+    def __str__(self):
+        return _today()
+
+    __html__ = __str__
+
+_lazy_today = _LazyToday()
+
+def _wants_json():
+    """True when the client expects a JSON reply rather than a redirect/page"""
+    return (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or request.accept_mimetypes.best == 'application/json')
+
 # Add template filter for current date
 @app.template_filter('today')
 def today_filter(s):
-    return datetime.now().strftime('%Y-%m-%d')
+    return _today()
 
 # Add template context processor to make datetime available
 @app.context_processor
 def inject_datetime():
-    return {'datetime': datetime, 'today': datetime.now().strftime('%Y-%m-%d')}
+    return {'datetime': datetime, 'today': _lazy_today}
 
 @app.route('/')
 def index():
@@ -44,13 +135,15 @@ def index():
     stats = todo.get_statistics()
     categories = todo.get_categories()
     
-    return render_template('index.html', 
+    # Stream the page so the browser can start on the head and styles
+    # while the task list is still being rendered
+    return app.response_class(stream_template('index.html', 
                          tasks=tasks, 
                          stats=stats, 
                          categories=categories,
                          current_filter=filter_by,
                          current_sort=sort_by,
-                         search_query=search_query or '')
+                         search_query=search_query or ''))
 
 @app.route('/about')
 def about():
@@ -58,6 +151,7 @@ def about():
 
 @app.route('/tasks', methods=['POST'])
 def create_task():
+    json_reply = _wants_json()
     try:
         title = request.form.get('title', '').strip()
         priority = request.form.get('priority', 'medium')
@@ -69,19 +163,19 @@ def create_task():
         
         task = todo.create_task(title, priority, category, due_date)
         
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if json_reply:
             return jsonify({'success': True, 'task': task})
         else:
             return redirect(url_for('index'))
             
     except ValueError as e:
         error_msg = str(e)
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if json_reply:
             return jsonify({'success': False, 'error': error_msg}), 400
         return redirect(url_for('index'))
     except Exception as e:
         error_msg = 'Failed to create task'
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if json_reply:
             return jsonify({'success': False, 'error': error_msg}), 500
         return redirect(url_for('index'))
 
@@ -106,10 +200,11 @@ def update_task(task_id):
 
 @app.route('/tasks/<int:task_id>', methods=['DELETE', 'POST'])
 def delete_task(task_id):
+    json_reply = request.method == 'DELETE' or _wants_json()
     try:
         success = todo.delete_task(task_id)
         
-        if request.method == 'DELETE' or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if json_reply:
             if success:
                 return jsonify({'success': True})
             else:
@@ -118,7 +213,7 @@ def delete_task(task_id):
             return redirect(url_for('index'))
             
     except Exception as e:
-        if request.method == 'DELETE' or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if json_reply:
             return jsonify({'success': False, 'error': 'Failed to delete task'}), 500
         return redirect(url_for('index'))
 
@@ -143,10 +238,7 @@ def bulk_delete():
         data = request.get_json()
         task_ids = data.get('task_ids', [])
         
-        deleted_count = 0
-        for task_id in task_ids:
-            if todo.delete_task(task_id):
-                deleted_count += 1
+        deleted_count = todo.delete_many(task_ids)
         
         return jsonify({
             'success': True, 
@@ -171,22 +263,71 @@ def clear_completed():
 
 @app.errorhandler(BadRequest)
 def handle_bad_request(e):
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if _wants_json():
         return jsonify({'success': False, 'error': str(e)}), 400
     return redirect(url_for('index'))
 
 @app.errorhandler(404)
 def handle_not_found(e):
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if _wants_json():
         return jsonify({'success': False, 'error': 'Not found'}), 404
     return render_template('404.html'), 404
 
 @app.errorhandler(500)
 def handle_server_error(e):
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if _wants_json():
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
     return render_template('500.html'), 500
 
+def _gemini_text(gemini_data):
+    """Pull the reply text out of a Gemini response"""
+    candidates = gemini_data.get('candidates', [])
+    if candidates:
+        parts = candidates[0].get('content', {}).get('parts', [])
+        if parts and 'text' in parts[0]:
+            return parts[0]['text']
+    return None
+
+def _finish_chat(response_text, cache_key):
+    """Apply any action in a Gemini reply and format it for the chat window"""
+    raw_text = response_text
+    # Look for JSON command
+    action = None
+    if _ACTION_MARKER in raw_text:
+        parts = raw_text.split(_ACTION_MARKER)
+        user_reply = parts[0].strip()
+        try:
+            action = orjson.loads(parts[1].strip())
+        except Exception:
+            action = None
+        # Anything but a JSON object (e.g. [], 0, "ok") is not a command
+        if not isinstance(action, dict):
+            action = None
+    else:
+        user_reply = raw_text
+
+    if action is None or action.get("action") == "list":
+        _gemini_cache[cache_key] = response_text
+        if len(_gemini_cache) > _GEMINI_CACHE_SIZE:
+            _gemini_cache.popitem(last=False)
+
+    # Escape the model's text before it becomes HTML in the chat window
+    reply_html = Markup(_NEWLINE_RE.sub('<br>', escape(user_reply)))
+
+    # If AI suggested an action
+    if action:
+        if action.get("action") == "add":
+            title = action.get("title")
+            priority = action.get("priority", "medium")
+            completed = action.get("completed", False)
+            todo.create_task(title, priority, "general", None)
+            # Add styled HTML for success message
+            reply_html += _ADDED_HTML.format(title, priority, priority.capitalize())
+
+    # Wrap AI reply in a styled container
+    formatted_response = str(_RESPONSE_HTML.format(reply_html))
+    return formatted_response, action
+
 @app.route('/chat', methods=['POST'])
 def chat():
     try:
@@ -197,97 +338,36 @@ def chat():
             return jsonify({'success': False, 'response': 'Message is required.'}), 400
 
         # Include tasks in context
-        tasks = todo.read_tasks()
-        task_context = "\n".join(
-            [f"- {t['title']} (priority: {t['priority']}, completed: {t['completed']})"
-             for t in tasks]
-        )
-        # Enhanced prompt for structured response and JSON command
-        prompt = f"""
-You are a To-Do List assistant.
-Always reply in **two parts**:
-1. A natural language response for the user, using:
-   - Bullet points for tasks
-   - **Bold** for task titles
-   - '✅' for completed, '⏳' for pending
-2. A JSON object on a new line starting with '###JSON###' that specifies the action.
-
-Valid actions:
-- add {{"title": "...", "priority": "high/medium/low", "completed": true/false}}
-- complete {{"id": 1}}
-- delete {{"id": 1}}
-- list {{}}
-
-User's current tasks:
-{task_context}
-
-User query: {user_message}
-"""
+        task_context = "\n".join(todo.get_prompt_lines())
+        prompt = f"{_PROMPT_HEAD}{task_context}\n\nUser query: {user_message}\n"
 
         GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-        GEMINI_MODEL = "gemini-1.5-flash"
-        GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1/models/{GEMINI_MODEL}:generateContent"
 
         if not GEMINI_API_KEY:
             return jsonify({'success': False, 'response': 'Gemini API key is not set in .env'}), 500
 
-        headers = {'Content-Type': 'application/json'}
         payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        cache_key = hashlib.sha256(prompt.encode()).hexdigest()
 
-        r = requests.post(
-            f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
-            headers=headers,
-            json=payload,
-            timeout=15
-        )
-        r.raise_for_status()
-        gemini_data = r.json()
-
-        candidates = gemini_data.get('candidates', [])
-        response_text = None
-        if candidates:
-            parts = candidates[0].get('content', {}).get('parts', [])
-            if parts and 'text' in parts[0]:
-                response_text = parts[0]['text']
+        response_text = _gemini_cache.get(cache_key)
+        if response_text is not None:
+            _gemini_cache.move_to_end(cache_key)
+            gemini_data = {}
+        else:
+            r = _http.post(
+                GEMINI_API_URL,
+                # Header rather than query string, so the key never shows
+                # up in URLs echoed by error messages or logs
+                headers={'x-goog-api-key': GEMINI_API_KEY},
+                json=payload,
+                timeout=15
+            )
+            r.raise_for_status()
+            gemini_data = r.json()
+            response_text = _gemini_text(gemini_data)
 
         if response_text:
-            import json
-            raw_text = response_text
-            # Look for JSON command
-            action = None
-            if "###JSON###" in raw_text:
-                parts = raw_text.split("###JSON###")
-                user_reply = parts[0].strip()
-                try:
-                    action = json.loads(parts[1].strip())
-                except Exception:
-                    action = None
-            else:
-                user_reply = raw_text
-
-            # If AI suggested an action
-            if action:
-                if action.get("action") == "add":
-                    title = action.get("title")
-                    priority = action.get("priority", "medium")
-                    completed = action.get("completed", False)
-                    todo.create_task(title, priority, "general", None)
-                    # Add styled HTML for success message
-                    user_reply += (
-                        f"<div class='ai-success'>"
-                        f"<span class='ai-icon'>✅</span> "
-                        f"<span class='ai-task-title'>{title}</span> "
-                        f"<span class='ai-task-priority {priority}'>{priority.capitalize()} priority</span> "
-                        f"added successfully!"
-                        f"</div>"
-                    )
-
-            # Wrap AI reply in a styled container
-            formatted_response = (
-                f"<div class='ai-response ai-todo-list'>"
-                f"{user_reply.replace(chr(10), '<br>')}"
-                f"</div>"
-            )
+            formatted_response, action = _finish_chat(response_text, cache_key)
             return jsonify({
                 'success': True,
                 'response': formatted_response,
@@ -295,10 +375,17 @@ User query: {user_message}
             })
         else:
             error_msg = gemini_data.get('error', {}).get('message', "Gemini returned no response")
-            return jsonify({'success': False, 'response': f'Gemini API error: {error_msg}'}), 400
+            return jsonify({'success': False, 'response': f'Gemini API error: {escape(error_msg)}'}), 400
 
-    except Exception as e:
-        return jsonify({'success': False, 'response': f'Error: {str(e)}'}), 500
+    except Exception:
+        # The widget renders this as HTML, and exception text can carry
+        # request details, so keep it generic and log the specifics
+        app.logger.exception('Chat request failed')
+        return jsonify({'success': False, 'response': 'Error: the assistant request failed. Please try again.'}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see
+    # gunicorn.conf.py). Debug mode is opt-in so the interactive debugger
+    # is never exposed by accident.
+    debug = os.environ.get('FLASK_ENV') == 'development'
+    app.run(debug=debug, port=5000)
\ No newline at end of file
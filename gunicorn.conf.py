@@ -0,0 +1,16 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app`
+# from the project root.
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+
+# Todo keeps its indexes and caches in process memory, so separate
+# worker processes would each hold their own copy of the task list and
+# drift apart. Concurrency comes from gevent instead: one worker serves
+# many requests at once while /chat waits on Gemini.
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gevent'
+worker_connections = 1000
+
+keepalive = 5
+timeout = 30
@@ -1,41 +1,160 @@
 from datetime import datetime
 import json
 import os
+import sqlite3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    priority TEXT,
+    category TEXT,
+    created_at TEXT,
+    due_date TEXT,
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_status ON tasks(completed, priority);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+_COLUMNS = ('id', 'title', 'completed', 'priority', 'category', 'created_at', 'due_date', 'notes')
+
+_UPSERT_SQL = (
+    f"INSERT OR REPLACE INTO tasks ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+)
+
+# Keep "IN (?, ?, ...)" lists under SQLite's bound-parameter limit
+_DELETE_CHUNK = 500
+
+_PRIORITY_ORDER = {'high': 1, 'medium': 2, 'low': 3}
+
+# filter name -> predicate; 'category:<name>' filters are handled separately
+_FILTERS = {
+    'completed': lambda t: t['completed'],
+    'pending': lambda t: not t['completed'],
+    'high': lambda t: t['priority'] == 'high',
+    'medium': lambda t: t['priority'] == 'medium',
+    'low': lambda t: t['priority'] == 'low',
+}
+
+# sort name -> (key function, reverse)
+_SORT_KEYS = {
+    'priority': (lambda x: (x['completed'], _PRIORITY_ORDER.get(x['priority'], 4)), False),
+    'created_at': (lambda x: x.get('created_at', ''), True),
+    'title': (lambda x: x['title'].lower(), False),
+    'due_date': (lambda x: x.get('due_date') or '9999-12-31', False),
+}
+
+# Upper bound on cached read_tasks() views; filters come from the query
+# string, so arbitrary category names must not grow the cache forever
+_VIEW_CACHE_SIZE = 32
+
+def _search_text(task):
+    """Lower-cased title and notes, joined so a query can't match across them"""
+    return f"{task['title'].lower()}\0{task.get('notes', '').lower()}"
+
+def _row_values(task):
+    """Column values for a task, in _COLUMNS order"""
+    return (task['id'], task['title'], int(task['completed']), task.get('priority'),
+            task.get('category', 'general'), task.get('created_at'), task.get('due_date'),
+            task.get('notes', ''))
+
+def _prompt_line(task):
+    """One line describing a task in the chat assistant's prompt"""
+    return f"- {task['title']} (priority: {task['priority']}, completed: {task['completed']})"
 
 class Todo:
-    def __init__(self, data_file='tasks.json'):
+    def __init__(self, data_file='tasks.db', legacy_file='tasks.json'):
         self.data_file = data_file
-        self.tasks = []
+        self.legacy_file = legacy_file
+        self._conn = sqlite3.connect(data_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        # Insertion-ordered id -> task dict; the single source of truth, so
+        # deletes are O(1) and tasks keep their creation order
+        self._by_id = {}
+        self._search_index = {}
+        self._prompt_lines = {}
         self.next_id = 1
+        self._stats_cache = None
+        self._stats_dirty = True
+        self._categories_cache = None
+        self._view_cache = {}
+        self._default_view = None
         self.load_tasks()
 
     def load_tasks(self):
-        """Load tasks from JSON file"""
+        """Load tasks from the SQLite database"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        if row is None:
+            tasks = self._import_legacy_file()
+        else:
+            self.next_id = row['value']
+            tasks = []
+            for row in self._conn.execute('SELECT * FROM tasks ORDER BY id'):
+                task = dict(row)
+                task['completed'] = bool(task['completed'])
+                tasks.append(task)
+        self._by_id = {t['id']: t for t in tasks}
+        self._search_index = {t['id']: _search_text(t) for t in tasks}
+        self._prompt_lines = {t['id']: _prompt_line(t) for t in tasks}
+        self._mark_changed()
+        self._categories_cache = None
+
+    def _import_legacy_file(self):
+        """Seed a new database from the old tasks.json store, if there is one"""
+        tasks = []
+        self.next_id = 1
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
+            if self.legacy_file and os.path.exists(self.legacy_file):
+                with open(self.legacy_file, 'r') as f:
                     data = json.load(f)
-                    self.tasks = data.get('tasks', [])
+                    tasks = data.get('tasks', [])
                     self.next_id = data.get('next_id', 1)
         except (json.JSONDecodeError, FileNotFoundError):
-            self.tasks = []
+            tasks = []
             self.next_id = 1
+        with self._conn:
+            self._conn.executemany(_UPSERT_SQL, [_row_values(t) for t in tasks])
+            self._write_next_id(self.next_id)
+        return tasks
 
-    def save_tasks(self):
-        """Save tasks to JSON file"""
-        try:
-            data = {
-                'tasks': self.tasks,
-                'next_id': self.next_id
-            }
-            with open(self.data_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving tasks: {e}")
+    def _write_next_id(self, next_id):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (next_id,)
+        )
+
+    def _delete_rows(self, task_ids):
+        for i in range(0, len(task_ids), _DELETE_CHUNK):
+            chunk = task_ids[i:i + _DELETE_CHUNK]
+            self._conn.execute(
+                f"DELETE FROM tasks WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+            )
+
+    @property
+    def tasks(self):
+        """All tasks, in creation order"""
+        return list(self._by_id.values())
+
+    def _mark_changed(self):
+        """Drop cached results derived from the task list"""
+        self._stats_dirty = True
+        self._view_cache.clear()
+        self._default_view = None
 
     def create_task(self, title, priority='medium', category='general', due_date=None):
-        if not title or not title.strip():
+        if not isinstance(title, str) or not title.strip():
             raise ValueError("Task title cannot be empty")
+        for field, value in (('priority', priority), ('category', category), ('due_date', due_date)):
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"Task {field} must be a string")
         
         task = {
             'id': self.next_id,
@@ -47,89 +166,155 @@ class Todo:
             'due_date': due_date,
             'notes': ''
         }
-        self.tasks.append(task)
+        # Write the row first; memory only changes once it is committed.
+        # `with self._conn` commits on success and rolls back on error.
+        with self._conn:
+            self._conn.execute(_UPSERT_SQL, _row_values(task))
+            self._write_next_id(self.next_id + 1)
+        
+        self._by_id[task['id']] = task
+        self._search_index[task['id']] = _search_text(task)
+        self._prompt_lines[task['id']] = _prompt_line(task)
         self.next_id += 1
-        self.save_tasks()
+        self._mark_changed()
+        if self._categories_cache is not None:
+            self._categories_cache.add(category)
         return task
 
     def read_tasks(self, filter_by=None, sort_by='priority'):
-        """Get tasks with optional filtering and sorting"""
-        filtered_tasks = self.tasks.copy()
+        """Get tasks with optional filtering and sorting.
+
+        Results are cached as tuples until the next mutation, so callers
+        share them and must not modify them.
+        """
+        # Fast path for the index page's default view
+        if filter_by is None and sort_by == 'priority':
+            if self._default_view is None:
+                self._default_view = self._build_view(None, 'priority')
+            return self._default_view
+        
+        cache_key = (filter_by, sort_by)
+        cached = self._view_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        view = self._build_view(filter_by, sort_by)
+        if len(self._view_cache) >= _VIEW_CACHE_SIZE:
+            self._view_cache.clear()
+        self._view_cache[cache_key] = view
+        return view
+
+    def _build_view(self, filter_by, sort_by):
+        filtered_tasks = list(self._by_id.values())
         
         # Apply filters
         if filter_by:
-            if filter_by == 'completed':
-                filtered_tasks = [t for t in filtered_tasks if t['completed']]
-            elif filter_by == 'pending':
-                filtered_tasks = [t for t in filtered_tasks if not t['completed']]
-            elif filter_by in ['high', 'medium', 'low']:
-                filtered_tasks = [t for t in filtered_tasks if t['priority'] == filter_by]
-            elif filter_by.startswith('category:'):
-                category = filter_by.split(':')[1]
-                filtered_tasks = [t for t in filtered_tasks if t.get('category', 'general') == category]
+            predicate = _FILTERS.get(filter_by)
+            if predicate is not None:
+                filtered_tasks = [t for t in filtered_tasks if predicate(t)]
+            else:
+                prefix, _, category = filter_by.partition(':')
+                if prefix == 'category':
+                    filtered_tasks = [t for t in filtered_tasks if t.get('category', 'general') == category]
         
         # Sort tasks
-        if sort_by == 'priority':
-            priority_order = {'high': 1, 'medium': 2, 'low': 3}
-            filtered_tasks.sort(key=lambda x: (x['completed'], priority_order.get(x['priority'], 4)))
-        elif sort_by == 'created_at':
-            filtered_tasks.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        elif sort_by == 'title':
-            filtered_tasks.sort(key=lambda x: x['title'].lower())
-        elif sort_by == 'due_date':
-            filtered_tasks.sort(key=lambda x: x.get('due_date') or '9999-12-31')
-        
-        return filtered_tasks
+        sort_spec = _SORT_KEYS.get(sort_by)
+        if sort_spec is not None:
+            key, reverse = sort_spec
+            filtered_tasks.sort(key=key, reverse=reverse)
+        
+        return tuple(filtered_tasks)
 
     def get_task(self, task_id):
-        for task in self.tasks:
-            if task['id'] == task_id:
-                return task
-        return None
+        return self._by_id.get(task_id)
 
     def update_task(self, task_id, **kwargs):
         task = self.get_task(task_id)
         if not task:
             return None
         
-        # Update allowed fields
+        # Validate everything, then write the merged row, and only then touch
+        # the task so a rejected or failed update leaves memory, the caches
+        # and the database in agreement
         allowed_fields = ['title', 'completed', 'priority', 'category', 'due_date', 'notes']
-        for field, value in kwargs.items():
-            if field in allowed_fields and value is not None:
-                if field == 'title' and (not value or not value.strip()):
-                    raise ValueError("Task title cannot be empty")
-                if field == 'completed':
-                    task[field] = bool(value)
-                else:
-                    task[field] = value
-        
-        self.save_tasks()
+        updates = {field: value for field, value in kwargs.items()
+                   if field in allowed_fields and value is not None}
+        for field, value in updates.items():
+            if field == 'completed':
+                if not isinstance(value, (bool, int)):
+                    raise ValueError("Task completed must be true or false")
+                updates[field] = bool(value)
+            elif not isinstance(value, str):
+                raise ValueError(f"Task {field} must be a string")
+        if 'title' in updates and not updates['title'].strip():
+            raise ValueError("Task title cannot be empty")
+        
+        with self._conn:
+            self._conn.execute(_UPSERT_SQL, _row_values({**task, **updates}))
+        
+        # Update allowed fields
+        if 'category' in updates and updates['category'] != task.get('category'):
+            # The old category may no longer be in use
+            self._categories_cache = None
+        task.update(updates)
+        
+        self._mark_changed()
+        if 'title' in updates or 'notes' in updates:
+            self._search_index[task_id] = _search_text(task)
+        if 'title' in updates or 'priority' in updates or 'completed' in updates:
+            self._prompt_lines[task_id] = _prompt_line(task)
         return task
 
     def delete_task(self, task_id):
-        task = self.get_task(task_id)
-        if not task:
+        if task_id not in self._by_id:
             return False
-        self.tasks.remove(task)
-        self.save_tasks()
+        with self._conn:
+            self._conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        del self._by_id[task_id]
+        del self._search_index[task_id]
+        del self._prompt_lines[task_id]
+        self._mark_changed()
+        self._categories_cache = None
         return True
 
+    def delete_many(self, task_ids):
+        """Delete several tasks in one pass, returning how many were removed"""
+        # Ids come straight from request JSON; skip anything that isn't an
+        # int (lists would make the set raise, bools would alias 0/1)
+        id_set = {task_id for task_id in task_ids
+                  if isinstance(task_id, int) and not isinstance(task_id, bool)
+                  and task_id in self._by_id}
+        if not id_set:
+            return 0
+        with self._conn:
+            self._delete_rows(list(id_set))
+        for task_id in id_set:
+            del self._by_id[task_id]
+            del self._search_index[task_id]
+            del self._prompt_lines[task_id]
+        self._mark_changed()
+        self._categories_cache = None
+        return len(id_set)
+
     def get_statistics(self):
-        """Get task statistics"""
-        total_tasks = len(self.tasks)
-        completed_tasks = len([t for t in self.tasks if t['completed']])
+        """Get task statistics (cached until the next mutation)"""
+        if not self._stats_dirty:
+            return self._stats_cache
+        
+        total_tasks = len(self._by_id)
+        completed_tasks = len([t for t in self._by_id.values() if t['completed']])
         pending_tasks = total_tasks - completed_tasks
         
         priority_counts = {'high': 0, 'medium': 0, 'low': 0}
         category_counts = {}
         
-        for task in self.tasks:
+        for task in self._by_id.values():
             if not task['completed']:  # Count only pending tasks
                 priority_counts[task['priority']] = priority_counts.get(task['priority'], 0) + 1
                 category = task.get('category', 'general')
                 category_counts[category] = category_counts.get(category, 0) + 1
         
-        return {
+        self._stats_cache = {
             'total': total_tasks,
             'completed': completed_tasks,
             'pending': pending_tasks,
@@ -137,6 +322,8 @@ class Todo:
             'priority_counts': priority_counts,
             'category_counts': category_counts
         }
+        self._stats_dirty = False
+        return self._stats_cache
 
     def search_tasks(self, query):
         """Search tasks by title or notes"""
@@ -144,27 +331,31 @@ class Todo:
             return []
         
         query = query.lower().strip()
-        results = []
-        
-        for task in self.tasks:
-            if (query in task['title'].lower() or 
-                query in task.get('notes', '').lower()):
-                results.append(task)
-        
-        return results
+        return [self._by_id[task_id]
+                for task_id, text in self._search_index.items()
+                if query in text]
+
+    def get_prompt_lines(self):
+        """Pre-formatted prompt lines for every task, in the default view order"""
+        return [self._prompt_lines[t['id']] for t in self.read_tasks()]
 
     def get_categories(self):
         """Get all unique categories"""
-        categories = set()
-        for task in self.tasks:
-            categories.add(task.get('category', 'general'))
-        return sorted(list(categories))
+        if self._categories_cache is None:
+            self._categories_cache = {t.get('category', 'general') for t in self._by_id.values()}
+        return sorted(self._categories_cache)
 
     def delete_completed_tasks(self):
         """Delete all completed tasks"""
-        initial_count = len(self.tasks)
-        self.tasks = [t for t in self.tasks if not t['completed']]
-        deleted_count = initial_count - len(self.tasks)
+        completed_ids = [task_id for task_id, t in self._by_id.items() if t['completed']]
+        deleted_count = len(completed_ids)
         if deleted_count > 0:
-            self.save_tasks()
+            with self._conn:
+                self._conn.execute('DELETE FROM tasks WHERE completed = 1')
+            for task_id in completed_ids:
+                del self._by_id[task_id]
+                del self._search_index[task_id]
+                del self._prompt_lines[task_id]
+            self._mark_changed()
+            self._categories_cache = None
         return deleted_count
\ No newline at end of file